@@ -1,77 +1,285 @@
 
-from langchain.chat_models import ChatOpenAI
-from langchain.schema import HumanMessage
+from openai import AsyncOpenAI
+import redis.asyncio as redis
+import numpy as np
+import httpx
+import asyncio
+import functools
+import hashlib
 import os
-import json
+import queue
+import orjson
+from html import escape
+from pydantic import BaseModel, ValidationInfo, conlist, field_validator
 from dotenv import load_dotenv
 import logging
+from logging.handlers import QueueHandler, QueueListener
 
-# ✅ Setup basic logging configuration
+# ✅ Setup basic logging configuration (set LOG_LEVEL=WARNING to quiet per-request logs)
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+_log_listener = None
 
 # ✅ Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+REDIS_URL = os.getenv("REDIS_URL")
+MODEL = "gpt-3.5-turbo"
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# ✅ Low temperature keeps answers near-deterministic so cached replies stay valid
+TEMPERATURE = 0.2
+_CACHE_MAX_TEMPERATURE = 0.3
+
+# ✅ Cache TTL tiers (seconds)
+TUTOR_CACHE_TTL = 60 * 60
+QUIZ_CACHE_TTL = 24 * 60 * 60
+
+# ✅ Semantic cache: reuse an answer when a paraphrased question is this similar
+SEMANTIC_CACHE_THRESHOLD = 0.92
+_SEMANTIC_CACHE_MAX_ENTRIES = 1000
+
+# ✅ In-process semantic index, partitioned by request context:
+#    partition -> {"vectors": (n, d) array, "answers": [str, ...]}
+#    It lives in each worker process, so with N uvicorn workers the hit rate is split
+#    N ways, and the index starts empty again on every restart or deploy.
+_semantic_index = {}
+
+# ✅ Caps in-flight quiz question calls so quizzes stay within rate limits. Limits are
+#    per worker process: a host running N uvicorn workers can have up to N * (10 + 3)
+#    quiz calls in flight, so size WEB_CONCURRENCY against the account's rate limit.
+_QUIZ_CONCURRENCY = asyncio.Semaphore(10)
+
+# ✅ Background quiz prefetches: their LLM calls get their own small pool so they never
+#    take _QUIZ_CONCURRENCY slots from foreground quizzes
+_PREFETCH_QUESTION_CONCURRENCY = asyncio.Semaphore(3)
+_MAX_PREFETCHES = 5
+_prefetch_inflight = {}
+
+# ✅ Quiz question calls that are currently running, by llm: cache key. Registered only
+#    once a call holds its semaphore slot, so joining one never queues a request behind
+#    someone else's pool.
+_inflight_questions = {}
+
+# ✅ Fire-and-forget tasks, kept referenced until done so they aren't garbage collected
+_background_tasks = set()
+
+def _run_in_background(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+# ✅ Shared chat completion parameters (also used for Batch API requests in scripts/prewarm.py)
+def _completion_params(messages, json_mode=False):
+    params = {
+        "model": MODEL,
+        "messages": messages,
+        "temperature": TEMPERATURE
+    }
+    if json_mode:
+        params["response_format"] = {"type": "json_object"}
+    return params
+
+async def _complete(client, messages, json_mode=False):
+    response = await client.chat.completions.create(**_completion_params(messages, json_mode))
+    return response.choices[0].message.content
+
+# ✅ Client lifecycle (created per worker process from the FastAPI lifespan, after fork)
+def create_clients():
+    # One pooled OpenAI client shared by all concurrent requests. The SDK's own retries
+    # (exponential backoff, honours Retry-After on 429s) are the only retry layer, and
+    # 3 attempts x 15 s plus backoff stays inside the frontend's 60 s timeout.
+    client = AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)
+        ),
+        timeout=15,
+        max_retries=2
+    )
+    # Optional Redis response cache (disabled when REDIS_URL is not set). Short socket
+    # timeouts make an unreachable Redis fail fast into the cache-miss path.
+    cache = redis.from_url(
+        REDIS_URL,
+        decode_responses=True,
+        max_connections=50,
+        socket_connect_timeout=0.5,
+        socket_timeout=0.5
+    ) if REDIS_URL else None
+    return client, cache
+
+async def warm_up(client):
+    # Opens the pooled TLS connection up front without spending completion tokens.
+    # One 5 s attempt at most, so an unreachable API can't hold up startup.
+    try:
+        await client.with_options(max_retries=0, timeout=5).models.retrieve(MODEL)
+        logger.info("OpenAI client warmed up")
+    except Exception as e:
+        logger.warning(f"OpenAI warm-up failed: {str(e)}")
+
+async def cancel_background_tasks():
+    # Called before close_clients so no prefetch or indexing task outlives the pools
+    tasks = list(_background_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+async def close_clients(client, cache):
+    await client.close()
+    if cache is not None:
+        await cache.aclose()
+
+# ✅ Off-thread logging: request paths only enqueue records, a listener thread writes them
+def start_logging():
+    global _log_listener
+    if _log_listener is not None:
+        return
+    log_queue = queue.SimpleQueue()
+    _log_listener = QueueListener(log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+    logger.addHandler(QueueHandler(log_queue))
+    logger.propagate = False
+    _log_listener.start()
+
+def stop_logging():
+    global _log_listener
+    if _log_listener is None:
+        return
+    _log_listener.stop()
+    for handler in [h for h in logger.handlers if isinstance(h, QueueHandler)]:
+        logger.removeHandler(handler)
+    logger.propagate = True
+    _log_listener = None
+
+def _cache_enabled():
+    return TEMPERATURE <= _CACHE_MAX_TEMPERATURE
+
+def _cache_key(messages):
+    return "llm:" + hashlib.sha256(orjson.dumps(messages)).hexdigest()
+
+async def _cache_get(cache, key):
+    if cache is None or not _cache_enabled():
+        return None
+    try:
+        return await cache.get(key)
+    except Exception as e:
+        logger.warning(f"Cache lookup failed: {str(e)}")
+        return None
 
-# ✅ Function to initialize ChatOpenAI
-def get_llm():
+async def _cache_set(cache, key, ttl, content):
+    if cache is None or not _cache_enabled() or not content:
+        return
     try:
-        return ChatOpenAI(
-            temperature=0.7,
-            model_name="gpt-3.5-turbo",
-            openai_api_key=OPENAI_API_KEY
-        )
+        await cache.setex(key, ttl, content)
+    except Exception as e:
+        logger.warning(f"Cache write failed: {str(e)}")
+
+# ✅ Semantic cache helpers (embeddings are unit-length, so dot product == cosine)
+async def _embed(client, text):
+    response = await client.embeddings.create(model=EMBEDDING_MODEL, input=text)
+    return np.asarray(response.data[0].embedding, dtype=np.float32)
+
+def _semantic_lookup(partition, embedding):
+    entry = _semantic_index.get(partition)
+    if entry is None:
+        return None
+    scores = entry["vectors"] @ embedding
+    best = int(np.argmax(scores))
+    if scores[best] > SEMANTIC_CACHE_THRESHOLD:
+        return entry["answers"][best]
+    return None
+
+def _semantic_add(partition, embedding, content):
+    entry = _semantic_index.get(partition)
+    if entry is None:
+        _semantic_index[partition] = {"vectors": embedding[np.newaxis, :], "answers": [content]}
+        return
+    # Drop the oldest entries once the partition is full
+    entry["vectors"] = np.vstack([entry["vectors"], embedding])[-_SEMANTIC_CACHE_MAX_ENTRIES:]
+    entry["answers"] = (entry["answers"] + [content])[-_SEMANTIC_CACHE_MAX_ENTRIES:]
+
+async def _semantic_cache_lookup(client, partition, query):
+    # L2: nearest paraphrased question within the same partition.
+    # An empty partition can't hit, so skip the embeddings round trip entirely.
+    if not _cache_enabled() or partition not in _semantic_index:
+        return None, None
+    try:
+        embedding = await _embed(client, query)
+        return _semantic_lookup(partition, embedding), embedding
+    except Exception as e:
+        logger.warning(f"Semantic cache lookup failed: {str(e)}")
+        return None, None
+
+async def _semantic_index_answer(client, partition, query, content, embedding=None):
+    try:
+        if embedding is None:
+            embedding = await _embed(client, query)
+        _semantic_add(partition, embedding, content)
     except Exception as e:
-        logger.error(f"Error initializing LLM: {str(e)}")
-        raise Exception(f"Failed to initialize AI model: {str(e)}")
+        logger.warning(f"Semantic cache update failed: {str(e)}")
+
+async def _stream_complete(client, messages):
+    stream = await client.chat.completions.create(**_completion_params(messages), stream=True)
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
 
 # ✅ Tutoring Prompt Generator
-def generate_tutoring_response(subject, level, question, learning_style, background, language):
+async def stream_tutoring_response(client, cache, subject, level, question, learning_style, background, language):
     try:
-        prompt = _create_tutoring_prompt(subject, level, question, learning_style, background, language)
-        logger.info(f"Generating tutoring response for subject: {subject}, level: {level}")
-        
-        llm = get_llm()
-        response = llm([HumanMessage(content=prompt)])
-
-        # ✅ Extract response content safely
-        content = None
-        if hasattr(response, "content"):
-            content = response.content
-        elif hasattr(response, "generations"):
-            content = response.generations[0][0].text
-        elif isinstance(response, list) and hasattr(response[0], "content"):
-            content = response[0].content
-
-        if not content:
-            raise Exception("LLM returned no usable response content.")
-
-        logger.info("LLM response extracted successfully")
-        return format_tutoring_response(content, learning_style)
+        messages = _messages(
+            TUTOR_SYSTEM_PROMPT,
+            _create_tutoring_prompt(subject, level, question, learning_style, background, language)
+        )
+        logger.debug(f"Generating tutoring response for subject: {subject}, level: {level}")
+
+        # L1: exact prompt match in Redis (served as-is, so its TTL is not refreshed)
+        key = _cache_key(messages)
+        content = await _cache_get(cache, key)
+
+        if content is not None:
+            yield content
+        else:
+            partition = (subject, level, learning_style, background, language)
+            content, embedding = await _semantic_cache_lookup(client, partition, question)
+
+            if content is not None:
+                yield content
+            else:
+                parts = []
+                async for delta in _stream_complete(client, messages):
+                    parts.append(delta)
+                    yield delta
+                content = "".join(parts)
+
+                if not content:
+                    raise Exception("LLM returned no usable response content.")
+                # Index the answer after the stream has finished, off the response path
+                if _cache_enabled():
+                    _run_in_background(_semantic_index_answer(client, partition, question, content, embedding))
+
+            await _cache_set(cache, key, TUTOR_CACHE_TTL, content)
+            logger.debug("LLM response streamed successfully")
+
+        note = _learning_style_note(learning_style)
+        if note:
+            yield note
 
     except Exception as e:
         logger.error(f"Error generating tutoring response: {str(e)}")
         raise Exception(f"Failed to generate tutoring response: {str(e)}")
 
-def _create_tutoring_prompt(subject, level, question, learning_style, background, language):
-    return f"""
-Subject: {subject}
-Learning Level: {level}
-Background Knowledge: {background}
-Learning Style Preference: {learning_style}
-Language Preference: {language}
-
-QUESTION:
-{question}
+# ✅ Static instructions go first so every request shares the same cacheable prefix
+TUTOR_SYSTEM_PROMPT = """
+You are an expert, patient tutor.
 
 INSTRUCTIONS:
-1. Provide a clear, educational explanation that directly addresses the question
-2. Tailor your explanation to a {background} student at {level} level
-3. Use {language} as the primary language
+1. Provide a clear, educational explanation that directly addresses the student's question
+2. Tailor your explanation to the student's stated background knowledge and learning level
+3. Use the student's preferred language as the primary language
 4. Format your response with appropriate markdown for readability
 
 LEARNING STYLE ADAPTATIONS:
@@ -82,89 +290,225 @@ LEARNING STYLE ADAPTATIONS:
 Your explanation should be educational, accurate, and engaging.
 """
 
-def format_tutoring_response(content, learning_style):
+def _messages(system_prompt, user_prompt):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+@functools.lru_cache(maxsize=2048)
+def _create_tutoring_prompt(subject, level, question, learning_style, background, language):
+    return f"""
+Subject: {subject}
+Learning Level: {level}
+Background Knowledge: {background}
+Learning Style Preference: {learning_style}
+Language Preference: {language}
+
+QUESTION:
+{question}
+"""
+
+def _learning_style_note(learning_style):
     if learning_style == "Visual":
-        return content + "\n\n📝 *Note: Visualize these concepts as you read for better retention.*"
+        return "\n\n📝 *Note: Visualize these concepts as you read for better retention.*"
     elif learning_style == "Hands-on":
-        return content + "\n\n🛠️ *Tip: Try working through the examples yourself to reinforce your learning.*"
+        return "\n\n🛠️ *Tip: Try working through the examples yourself to reinforce your learning.*"
     else:
-        return content
+        return ""
 
 # ✅ Quiz Generation Section
-def _create_quiz_prompt(subject, level, num_questions):
-    return f"""
+QUIZ_SYSTEM_PROMPT = """
 You are a quiz generator.
 
-Generate a quiz on the subject **{subject}** at **{level}** level.
-
 Instructions:
-1. Generate **{num_questions}** multiple-choice questions (MCQs).
-2. Each question must have exactly 4 answer options (A, B, C, D).
+1. Generate exactly **1** multiple-choice question (MCQ) for the subject, level and topic given.
+2. The question must have exactly 4 answer options (A, B, C, D).
 3. Clearly indicate the correct answer.
-4. Cover diverse aspects of {subject}.
-
-FORMAT YOUR RESPONSE AS JSON:
-[
-    {{
-        "question": "Question text",
-        "options": ["Option A", "Option B", "Option C", "Option D"],
-        "correct_answer": "Option A",
-        "explanation": "Brief explanation of why this answer is correct"
-    }},
-    ...
-]
+4. Write the question about the given topic, so each question of the quiz covers different material.
+
+FORMAT YOUR RESPONSE AS A JSON OBJECT:
+{
+    "question": "Question text",
+    "options": ["Option A", "Option B", "Option C", "Option D"],
+    "correct_answer": "Option A",
+    "explanation": "Brief explanation of why this answer is correct"
+}
 
 IMPORTANT:
-- Make sure to return valid JSON that can be parsed.
-- Do not include any text outside the JSON array.
-- Include a brief explanation for each correct answer.
+- The correct_answer must be copied exactly from one of the options.
+- Include a brief explanation for the correct answer.
 """
 
-def _create_fallback_quiz(subject, num_questions):
-    logger.warning(f"Using fallback quiz for {subject}")
-    return [
-        {
-            "question": f"Sample {subject} question {i+1}",
-            "options": ["Option A", "Option B", "Option C", "Option D"],
-            "correct_answer": "Option A",
-            "explanation": "This is a fallback explanation."
-        }
-        for i in range(num_questions)
-    ]
+# ✅ One fixed topic per question index, so the questions of a quiz don't repeat each
+#    other while prompts stay deterministic for the llm: cache and scripts/prewarm.py.
+#    Ordered so that short quizzes still spread across the subject.
+QUIZ_TOPICS = {
+    "Mathematics": [
+        "arithmetic and number sense", "algebraic equations", "geometry", "functions and graphs",
+        "probability", "statistics", "trigonometry", "sequences and series", "calculus", "logic and proof"
+    ],
+    "Physics": [
+        "motion and kinematics", "forces and Newton's laws", "energy and work", "electricity and circuits",
+        "waves and sound", "light and optics", "heat and thermodynamics", "magnetism", "gravity and orbits",
+        "atoms and modern physics"
+    ],
+    "Computer Science": [
+        "algorithms", "data structures", "computer hardware", "operating systems", "networks and the internet",
+        "databases", "complexity and Big-O", "binary and data representation", "security and cryptography",
+        "software engineering"
+    ],
+    "History": [
+        "ancient civilizations", "classical Greece and Rome", "the Middle Ages", "the Renaissance and Reformation",
+        "exploration and empires", "revolutions of the 18th century", "the Industrial Revolution", "World War I",
+        "World War II", "the Cold War and decolonization"
+    ],
+    "Biology": [
+        "cell structure", "genetics and inheritance", "evolution", "human body systems", "ecology",
+        "plants and photosynthesis", "microorganisms", "DNA and protein synthesis", "cell division",
+        "classification of living things"
+    ],
+    "Programming": [
+        "variables and data types", "conditionals", "loops", "functions", "lists and dictionaries",
+        "strings", "error handling", "object-oriented programming", "recursion", "debugging and testing"
+    ],
+}
+
+# Fallback for subjects without a topic list, cycled by question index
+_QUIZ_ANGLES = [
+    "core definitions", "key facts", "cause and effect", "comparing related concepts", "a worked example",
+    "a real-world application", "a common misconception", "history and key figures",
+    "problem solving", "connections to other fields"
+]
 
-def _validate_quiz_data(quiz_data):
-    for question in quiz_data:
-        if not all(key in question for key in ["question", "options", "correct_answer"]):
-            raise ValueError("Each quiz item must have question, options, and correct_answer")
-        if not isinstance(question["options"], list) or len(question["options"]) != 4:
-            raise ValueError("Each question must have exactly 4 options")
-        if question["correct_answer"] not in question["options"]:
+def _quiz_topic(subject, index):
+    topics = QUIZ_TOPICS.get(subject)
+    if topics:
+        return topics[index % len(topics)]
+    return _QUIZ_ANGLES[index % len(_QUIZ_ANGLES)]
+
+@functools.lru_cache(maxsize=256)
+def _create_single_question_prompt(subject, level, index):
+    return f"Subject: {subject}\nLevel: {level}\nTopic: {_quiz_topic(subject, index)}"
+
+# ✅ Quiz item schema (validated in one pass by pydantic-core)
+class QuizItem(BaseModel):
+    question: str
+    options: conlist(str, min_length=4, max_length=4)
+    correct_answer: str
+    explanation: str = ""
+
+    @field_validator("correct_answer")
+    @classmethod
+    def _correct_answer_in_options(cls, value, info: ValidationInfo):
+        if value not in info.data.get("options", []):
             raise ValueError("The correct answer must be one of the options")
-
-def _parse_quiz_response(response_content, subject, num_questions):
+        return value
+
+def _parse_question_response(response_content):
+    question = QuizItem.model_validate(orjson.loads(response_content)).model_dump()
+    if not question["explanation"]:
+        question["explanation"] = f"The correct answer is {question['correct_answer']}."
+    return question
+
+async def _generate_single_question(client, cache, subject, level, index, semaphore):
+    messages = _messages(QUIZ_SYSTEM_PROMPT, _create_single_question_prompt(subject, level, index))
+    key = _cache_key(messages)
+    content = await _cache_get(cache, key)
+    if content is not None:
+        return _parse_question_response(content)
+
+    running = _inflight_questions.get(key)
+    if running is None:
+        waited = semaphore.locked()
+        async with semaphore:
+            running = _inflight_questions.get(key)
+            if running is None:
+                # Someone else may have finished this question while we were queued
+                content = await _cache_get(cache, key) if waited else None
+                if content is not None:
+                    return _parse_question_response(content)
+                running = asyncio.create_task(_run_question_call(client, cache, messages, key))
+                _inflight_questions[key] = running
+                running.add_done_callback(lambda _: _inflight_questions.pop(key, None))
+                # Shielded so a dropped request doesn't cancel a call others have joined
+                return await asyncio.shield(running)
+    return await asyncio.shield(running)
+
+async def _run_question_call(client, cache, messages, key):
+    content = await _complete(client, messages, json_mode=True)
+    question = _parse_question_response(content)
+    # Only cache replies that validated, so a bad one is retried next time
+    await _cache_set(cache, key, QUIZ_CACHE_TTL, content)
+    return question
+
+async def generate_quiz_data(client, cache, subject, level, num_questions, semaphore=_QUIZ_CONCURRENCY):
+    # ✅ One small call per question, dispatched concurrently
+    tasks = [_generate_single_question(client, cache, subject, level, i, semaphore) for i in range(num_questions)]
+    responses = await asyncio.gather(*tasks, return_exceptions=True)
+
+    quiz_data = []
+    for response in responses:
+        if isinstance(response, Exception):
+            logger.error(f"Error generating quiz question: {str(response)}")
+            continue
+        quiz_data.append(response)
+
+    if not quiz_data:
+        raise Exception("LLM returned no valid quiz questions.")
+    return quiz_data
+
+# ✅ Whole-quiz cache keys carry a version of everything that shapes a quiz (prompt,
+#    request parameters, item schema), so changing any of them retires old entries
+_QUIZ_VERSION = hashlib.sha256(
+    orjson.dumps(_completion_params(_messages(QUIZ_SYSTEM_PROMPT, ""), json_mode=True))
+    + orjson.dumps(QuizItem.model_json_schema())
+    + orjson.dumps([QUIZ_TOPICS, _QUIZ_ANGLES])
+).hexdigest()[:12]
+
+def _quiz_cache_key(subject, level, num_questions):
+    return f"quiz:{_QUIZ_VERSION}:" + hashlib.sha256(f"{subject}|{level}|{num_questions}".encode()).hexdigest()
+
+async def _build_quiz(client, cache, key, subject, level, num_questions, semaphore):
+    quiz_data = await generate_quiz_data(client, cache, subject, level, num_questions, semaphore)
+    # Only pin complete quizzes in the cache
+    if len(quiz_data) == num_questions:
+        await _cache_set(cache, key, QUIZ_CACHE_TTL, orjson.dumps(quiz_data).decode())
+    return quiz_data
+
+async def _get_quiz_data(client, cache, subject, level, num_questions):
+    key = _quiz_cache_key(subject, level, num_questions)
+    cached = await _cache_get(cache, key)
+    if cached is not None:
+        return orjson.loads(cached)
+
+    # Questions a running prefetch has already started are joined per question;
+    # the rest are generated on the foreground pool
+    return await _build_quiz(client, cache, key, subject, level, num_questions, _QUIZ_CONCURRENCY)
+
+async def _prefetch_quiz(client, cache, key, subject, level, num_questions):
     try:
-        quiz_data = json.loads(response_content)
-        _validate_quiz_data(quiz_data)
-        if len(quiz_data) > num_questions:
-            quiz_data = quiz_data[:num_questions]
-        for question in quiz_data:
-            if "explanation" not in question:
-                question["explanation"] = f"The correct answer is {question['correct_answer']}."
-        return quiz_data
-    except (json.JSONDecodeError, ValueError) as e:
-        logger.error(f"Error parsing quiz response: {str(e)}")
-        return _create_fallback_quiz(subject, num_questions)
-
-def generate_quiz_data(subject, level, num_questions):
-    prompt = _create_quiz_prompt(subject, level, num_questions)
-    llm = get_llm()
-    response = llm([HumanMessage(content=prompt)])
-    return _parse_quiz_response(response.content, subject, num_questions)
-
-def generate_quiz(subject, level, num_questions=5, reveal_answer=False):
+        if await _cache_get(cache, key) is None:
+            await _build_quiz(client, cache, key, subject, level, num_questions, _PREFETCH_QUESTION_CONCURRENCY)
+    except Exception as e:
+        logger.debug(f"Quiz prefetch failed for {subject}/{level}: {str(e)}")
+
+def prefetch_quiz(client, cache, subject, level, num_questions=5):
+    # Best effort: only useful with a shared cache, and dropped when prefetches are saturated
+    if cache is None or not _cache_enabled():
+        return
+    key = _quiz_cache_key(subject, level, num_questions)
+    if key in _prefetch_inflight or len(_prefetch_inflight) >= _MAX_PREFETCHES:
+        return
+    task = _run_in_background(_prefetch_quiz(client, cache, key, subject, level, num_questions))
+    _prefetch_inflight[key] = task
+    task.add_done_callback(lambda _: _prefetch_inflight.pop(key, None))
+
+async def generate_quiz(client, cache, subject, level, num_questions=5, reveal_answer=False):
     try:
-        quiz_data = generate_quiz_data(subject, level, num_questions)
+        quiz_data = await _get_quiz_data(client, cache, subject, level, num_questions)
         if reveal_answer:
+            # Rendering takes microseconds, cheaper than any cache round trip
             formatted_quiz = _format_quiz_with_reveal(quiz_data)
             return {
                 "quiz_data": quiz_data,
@@ -178,125 +522,83 @@ def generate_quiz(subject, level, num_questions=5, reveal_answer=False):
         logger.error(f"Error generating quiz: {str(e)}")
         raise Exception(f"Failed to generate quiz: {str(e)}")
 
-def _format_quiz_with_reveal(quiz_data):
-    html = """
-    <html>
-    <head>
+# ✅ Quiz page assets live in backend/static. With PUBLIC_BASE_URL set they are linked
+#    (long-cached, versioned by content hash); otherwise they are inlined so the page
+#    also works inside the Streamlit srcdoc iframe.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL")
+
+def _read_static(name):
+    with open(os.path.join(STATIC_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+_QUIZ_CSS = _read_static("quiz.css")
+_QUIZ_JS = _read_static("quiz.js")
+QUIZ_ASSET_VERSION = hashlib.sha256((_QUIZ_CSS + _QUIZ_JS).encode()).hexdigest()[:12]
+
+def _quiz_assets_html():
+    if PUBLIC_BASE_URL:
+        base = PUBLIC_BASE_URL.rstrip("/")
+        return f"""
+        <link rel="stylesheet" href="{base}/static/quiz.css?v={QUIZ_ASSET_VERSION}">
+        <script src="{base}/static/quiz.js?v={QUIZ_ASSET_VERSION}"></script>"""
+    return f"""
         <style>
-            body {
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                background-color: #f2f4f8;
-                color: #333;
-                padding: 20px;
-            }
-
-            .quiz-card {
-                background-color: #fff;
-                border-radius: 12px;
-                box-shadow: 0 4px 10px rgba(0,0,0,0.1);
-                margin: 20px auto;
-                padding: 20px;
-                max-width: 700px;
-                transition: transform 0.3s;
-            }
-
-            .quiz-card:hover {
-                transform: scale(1.01);
-            }
-
-            .question {
-                font-size: 18px;
-                font-weight: bold;
-            }
-
-            .option {
-                padding: 10px 14px;
-                margin: 8px 0;
-                border-radius: 8px;
-                border: 1px solid #ccc;
-                cursor: pointer;
-                transition: background-color 0.3s, transform 0.2s;
-            }
-
-            .option:hover {
-                background-color: #f0f0f0;
-                transform: scale(1.02);
-            }
-
-            .selected-correct {
-                background-color: #c8f7c5;
-                border-color: #28a745;
-                font-weight: bold;
-            }
-
-            .selected-incorrect {
-                background-color: #f8d7da;
-                border-color: #dc3545;
-            }
-
-            .answer {
-                margin-top: 12px;
-                padding: 12px;
-                background-color: #e9ecef;
-                border-left: 5px solid #007bff;
-                display: none;
-                border-radius: 8px;
-            }
-        </style>
+{_QUIZ_CSS}        </style>
         <script>
-            function handleAnswerSelection(isCorrect, selectedOption, questionNum) {
-                if (isCorrect) {
-                    selectedOption.className += ' selected-correct';
-                } else {
-                    selectedOption.className += ' selected-incorrect';
-                    revealAnswer(questionNum);
-                }
-            }
+{_QUIZ_JS}        </script>"""
 
-            function revealAnswer(questionNum) {
-                const answerDiv = document.getElementById("answer-" + questionNum);
-                answerDiv.style.display = 'block';
-                answerDiv.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
-
-                answerDiv.animate([
-                    { transform: 'scale(1.05)', opacity: 1 },
-                    { transform: 'scale(1)', opacity: 1 }
-                ], {
-                    duration: 800,
-                    iterations: 1
-                });
-            }
-        </script>
+# ✅ Static quiz page scaffolding, built once at import time
+_QUIZ_HEADER = f"""
+    <html>
+    <head>{_quiz_assets_html()}
     </head>
     <body>
     <h2>🧠 Interactive Quiz</h2>
     """
 
-    for i, question in enumerate(quiz_data):
-        html += f"""
+_QUIZ_FOOTER = """
+    </body>
+    </html>
+    """
+
+_QUIZ_CARD_HEADER = """
         <div class='quiz-card'>
-            <div class='question'>Q{i+1}: {question['question']}</div>
+            <div class='question'>Q{num}: {question}</div>
             <div class='options'>
         """
-        for option in question['options']:
-            is_correct = str(option == question['correct_answer']).lower()
-            html += f"""
-                <div class='option' onclick="handleAnswerSelection({is_correct}, this, {i+1})">
+
+_QUIZ_OPTION = """
+                <div class='option' onclick="handleAnswerSelection({is_correct}, this, {num})">
                     {option}
                 </div>
             """
-        html += f"""
+
+_QUIZ_CARD_FOOTER = """
             </div>
-            <div class='answer' id='answer-{i+1}'>
-                <strong>✅ Correct Answer:</strong> {question['correct_answer']}<br>
-                <em>💡 Explanation:</em> {question['explanation']}
+            <div class='answer' id='answer-{num}'>
+                <strong>✅ Correct Answer:</strong> {correct_answer}<br>
+                <em>💡 Explanation:</em> {explanation}
             </div>
         </div>
         """
 
-    html += """
-    </body>
-    </html>
-    """
-    return html
-
+def _format_quiz_with_reveal(quiz_data):
+    parts = [_QUIZ_HEADER]
+    for i, question in enumerate(quiz_data):
+        fields = {
+            "num": i + 1,
+            "question": escape(question['question']),
+            "correct_answer": escape(question['correct_answer']),
+            "explanation": escape(question['explanation'])
+        }
+        parts.append(_QUIZ_CARD_HEADER.format_map(fields))
+        for option in question['options']:
+            parts.append(_QUIZ_OPTION.format_map({
+                "num": fields["num"],
+                "is_correct": "true" if option == question['correct_answer'] else "false",
+                "option": escape(option)
+            }))
+        parts.append(_QUIZ_CARD_FOOTER.format_map(fields))
+    parts.append(_QUIZ_FOOTER)
+    return "".join(parts)
@@ -1,20 +1,37 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Path, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, StreamingResponse
 from pydantic import BaseModel, Field
 import os
+import json
+from contextlib import asynccontextmanager
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 
-from backend.ai_engine import generate_tutoring_response, generate_quiz
+from backend import ai_engine
+from backend.ai_engine import stream_tutoring_response, generate_quiz, prefetch_quiz
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# ✅ Connection pools are created per worker, after uvicorn forks, and closed on shutdown
+@asynccontextmanager
+async def lifespan(app):
+    ai_engine.start_logging()
+    app.state.openai, app.state.redis = ai_engine.create_clients()
+    await ai_engine.warm_up(app.state.openai)
+    yield
+    await ai_engine.cancel_background_tasks()
+    await ai_engine.close_clients(app.state.openai, app.state.redis)
+    ai_engine.stop_logging()
+
 app = FastAPI(
     title="AI_TUTOR_API",
     description="API for generating personalized tutoring content and quizzes",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # ✅ Enable CORS for all origins
@@ -26,6 +43,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ✅ Compress quiz HTML and JSON. Streaming routes bypass the compressor explicitly:
+#    only newer Starlette releases skip text/event-stream by themselves, and an older one
+#    would hold SSE chunks back inside the gzip buffer.
+_UNCOMPRESSED_PATHS = {"/tutor"}
+
+class StreamingAwareGZipMiddleware(GZipMiddleware):
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in _UNCOMPRESSED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+app.add_middleware(StreamingAwareGZipMiddleware, minimum_size=1024)
+
+# ✅ Quiz CSS/JS, cached by browsers for a year (URLs carry a content-hash version)
+class CachedStaticFiles(StaticFiles):
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+app.mount("/static", CachedStaticFiles(directory=ai_engine.STATIC_DIR), name="static")
+
 # ✅ Data models
 class TutorRequest(BaseModel):
     subject: str = Field(..., description="Academic subject")
@@ -47,58 +87,79 @@ class QuizQuestion(BaseModel):
     correct_answer: str
     explanation: Optional[str] = None
 
-class TutorResponse(BaseModel):
-    response: str
-
 class QuizResponse(BaseModel):
     quiz: List[Dict[str, Any]]
     formatted_quiz: Optional[str] = None
 
-# ✅ /tutor endpoint
-@app.post("/tutor", response_model=TutorResponse)
-async def get_tutoring_response(data: TutorRequest):
+# ✅ Server-sent events framing: one JSON object per `data:` line, then [DONE]
+async def _sse_events(deltas):
     try:
-        explanation = generate_tutoring_response(
-            data.subject,
-            data.level,
-            data.question,
-            data.learning_style,
-            data.background,
-            data.language
-        )
-        return {"response": explanation}
+        async for delta in deltas:
+            yield f"data: {json.dumps({'delta': delta})}\n\n"
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating explanation: {str(e)}")
-
-# ✅ /quiz endpoint
+        yield f"data: {json.dumps({'error': f'Error generating explanation: {str(e)}'})}\n\n"
+    yield "data: [DONE]\n\n"
+
+# ✅ /tutor endpoint (streams the explanation as it is generated)
+@app.post("/tutor")
+async def get_tutoring_response(data: TutorRequest, request: Request):
+    state = request.app.state
+    deltas = stream_tutoring_response(
+        state.openai,
+        state.redis,
+        data.subject,
+        data.level,
+        data.question,
+        data.learning_style,
+        data.background,
+        data.language
+    )
+    # ✅ Students usually ask for a quiz next, so warm it while the answer streams
+    prefetch_quiz(state.openai, state.redis, data.subject, data.level)
+    return StreamingResponse(
+        _sse_events(deltas),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ✅ Quiz content negotiation: HTML is only rendered when it is asked for
+async def _quiz_response(request, subject, level, num_questions, reveal_format):
+    wants_html = request.headers.get("accept", "").startswith("text/html")
+    state = request.app.state
+    quiz_result = await generate_quiz(
+        state.openai,
+        state.redis,
+        subject,
+        level,
+        num_questions,
+        reveal_answer=reveal_format or wants_html
+    )
+
+    if wants_html:
+        return HTMLResponse(quiz_result["formatted_quiz"])
+    if reveal_format:
+        return {
+            "quiz": quiz_result["quiz_data"],
+            "formatted_quiz": quiz_result["formatted_quiz"]
+        }
+    return {
+        "quiz": quiz_result["quiz_data"]
+    }
+
+# ✅ /quiz endpoint (JSON by default, HTML page with `Accept: text/html`)
 @app.post("/quiz", response_model=QuizResponse)
-async def generate_quiz_api(data: QuizRequest):
+async def generate_quiz_api(data: QuizRequest, request: Request):
     try:
-        quiz_result = generate_quiz(
-            data.subject,
-            data.level,
-            data.num_questions,
-            reveal_answer=data.reveal_format
-        )
-
-        if data.reveal_format:
-            return {
-                "quiz": quiz_result["quiz_data"],
-                "formatted_quiz": quiz_result["formatted_quiz"]
-            }
-        else:
-            return {
-                "quiz": quiz_result["quiz_data"]
-            }
-
+        return await _quiz_response(request, data.subject, data.level, data.num_questions, data.reveal_format)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating quiz: {str(e)}")
 
-# ✅ /quiz-html endpoint
+# ✅ /quiz-html endpoint (same cached quiz as /quiz, always rendered as HTML)
 @app.get("/quiz-html/{subject}/{level}/{num_questions}", response_class=HTMLResponse)
-async def get_quiz_html(subject: str, level: str, num_questions: int = 5):
+async def get_quiz_html(request: Request, subject: str, level: str, num_questions: int = Path(..., ge=1, le=10)):
     try:
-        quiz_result = generate_quiz(subject, level, num_questions, reveal_answer=True)
+        state = request.app.state
+        quiz_result = await generate_quiz(state.openai, state.redis, subject, level, num_questions, reveal_answer=True)
         return quiz_result["formatted_quiz"]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating quiz HTML: {str(e)}")
@@ -112,3 +173,16 @@ async def health_check():
 @app.get("/")
 async def root():
     return {"message": "Backend is running!"}
+
+# ✅ Production launcher: `python -m backend.main`
+#    "auto" picks uvloop/httptools when installed (uvicorn[standard] skips uvloop on Windows)
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(
+        "backend.main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8000")),
+        loop="auto",
+        http="auto",
+        workers=int(os.getenv("WEB_CONCURRENCY", "4"))
+    )
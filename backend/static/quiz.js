@@ -0,0 +1,22 @@
+function handleAnswerSelection(isCorrect, selectedOption, questionNum) {
+    if (isCorrect) {
+        selectedOption.className += ' selected-correct';
+    } else {
+        selectedOption.className += ' selected-incorrect';
+        revealAnswer(questionNum);
+    }
+}
+
+function revealAnswer(questionNum) {
+    const answerDiv = document.getElementById("answer-" + questionNum);
+    answerDiv.style.display = 'block';
+    answerDiv.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+
+    answerDiv.animate([
+        { transform: 'scale(1.05)', opacity: 1 },
+        { transform: 'scale(1)', opacity: 1 }
+    ], {
+        duration: 800,
+        iterations: 1
+    });
+}
@@ -1,6 +1,6 @@
 import streamlit as st
-import requests
-import uuid
+import httpx
+import json
 import random
 from streamlit.components.v1 import html
 
@@ -11,6 +11,18 @@ st.title("🧠 AI-Powered Tutor & Quiz App")
 
 API_ENDPOINT = "https://genius-guru-7.onrender.com"
 
+# ✅ Streamed explanations are redrawn at most once per this many deltas (or per line)
+RENDER_EVERY_DELTAS = 20
+
+# ✅ One pooled HTTP client per Streamlit server, so reruns reuse open connections
+@st.cache_resource
+def get_http():
+    return httpx.Client(
+        base_url=API_ENDPOINT,
+        timeout=60.0,
+        limits=httpx.Limits(max_keepalive_connections=10)
+    )
+
 
 # ✅ Sidebar
 with st.sidebar:
@@ -48,17 +60,36 @@ with tab1:
     if st.button("Get Explanation 🧠"):
         with st.spinner("Generating personalized explanation..."):
             try:
-                response = requests.post(f"{API_ENDPOINT}/tutor", json={
+                with get_http().stream("POST", "/tutor", json={
                     "subject": subject,
                     "level": level,
                     "learning_style": learning_style,
                     "language": language,
                     "background": background,
                     "question": question
-                })
-                data = response.json()
-                st.success("Here's your personalized explanation:")
-                st.markdown(data["response"], unsafe_allow_html=True)
+                }) as response:
+                    response.raise_for_status()
+                    st.success("Here's your personalized explanation:")
+                    placeholder = st.empty()
+                    parts = []
+                    pending = 0
+                    # ✅ Render the explanation incrementally from the SSE stream, redrawing
+                    #    on line breaks or every few deltas rather than on every token
+                    for line in response.iter_lines():
+                        if not line or not line.startswith("data: "):
+                            continue
+                        payload = line[len("data: "):]
+                        if payload == "[DONE]":
+                            break
+                        event = json.loads(payload)
+                        if "error" in event:
+                            raise Exception(event["error"])
+                        parts.append(event["delta"])
+                        pending += 1
+                        if pending >= RENDER_EVERY_DELTAS or "\n" in event["delta"]:
+                            placeholder.markdown("".join(parts), unsafe_allow_html=True)
+                            pending = 0
+                    placeholder.markdown("".join(parts), unsafe_allow_html=True)
             except Exception as e:
                 st.error(f"Error getting explanation: {str(e)}")
                 st.info(f"Make sure the backend server is running at {API_ENDPOINT}")
@@ -79,35 +110,41 @@ with col2:
 if quiz_button:
     with st.spinner("Creating quiz questions..."):
         try:
-            response = requests.post(
-                f"{API_ENDPOINT}/quiz",
+            # ✅ Keep the quiz across reruns so answering a question doesn't discard it
+            response = get_http().post(
+                "/quiz",
                 json={
                     "subject": subject,
                     "level": level,
                     "num_questions": num_questions,
                     "reveal_format": True
                 }
-            ).json()
-
-            st.success("✅ Quiz generated! Try answering these questions:")
-
-            if "formatted_quiz" in response and response["formatted_quiz"]:
-                html(response["formatted_quiz"], height=num_questions * 300)
-            else:
-                for i, q in enumerate(response["quiz"]):
-                    with st.expander(f"Question {i+1}: {q['question']}", expanded=True):
-                        session_id = str(uuid.uuid4())
-                        selected = st.radio("Choose an answer:", q["options"], key=session_id)
-                        if selected:
-                            if selected == q["correct_answer"]:
-                                st.success(f"✅ Correct! {q.get('explanation', '')}")
-                            else:
-                                st.error(f"❌ Incorrect. The correct answer is: {q['correct_answer']}")
-                                if "explanation" in q:
-                                    st.info(q["explanation"])
+            )
+            response.raise_for_status()
+            st.session_state["quiz"] = response.json()
         except Exception as e:
+            st.session_state.pop("quiz", None)
             st.error(f"Error generating quiz: {str(e)}")
             st.info(f"Make sure the backend server is running at {API_ENDPOINT}")
 
+if "quiz" in st.session_state:
+    response = st.session_state["quiz"]
+    st.success("✅ Quiz generated! Try answering these questions:")
+
+    if "formatted_quiz" in response and response["formatted_quiz"]:
+        html(response["formatted_quiz"], height=len(response["quiz"]) * 300)
+    else:
+        for i, q in enumerate(response["quiz"]):
+            with st.expander(f"Question {i+1}: {q['question']}", expanded=True):
+                # ✅ Deterministic key so Streamlit keeps the selected answer between reruns
+                selected = st.radio("Choose an answer:", q["options"], key=f"quiz-{i}-{hash(q['question']) & 0xffff}")
+                if selected:
+                    if selected == q["correct_answer"]:
+                        st.success(f"✅ Correct! {q.get('explanation', '')}")
+                    else:
+                        st.error(f"❌ Incorrect. The correct answer is: {q['correct_answer']}")
+                        if "explanation" in q:
+                            st.info(q["explanation"])
+
 st.markdown("---")
 st.markdown("Powered by AI – Your Personal Learning Assistant")
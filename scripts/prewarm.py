@@ -0,0 +1,130 @@
+"""
+Pre-generate quiz questions through the OpenAI Batch API and load them into
+the Redis response cache used by backend/ai_engine.py.
+
+Run from the repository root (REDIS_URL and OPENAI_API_KEY must be set):
+
+    python -m scripts.prewarm
+"""
+import argparse
+import io
+import logging
+import sys
+import time
+
+import orjson
+import redis
+from openai import OpenAI
+from pydantic import ValidationError
+
+from backend.ai_engine import (
+    OPENAI_API_KEY,
+    QUIZ_CACHE_TTL,
+    QUIZ_SYSTEM_PROMPT,
+    REDIS_URL,
+    _cache_key,
+    _completion_params,
+    _create_single_question_prompt,
+    _messages,
+    _parse_question_response,
+)
+
+logger = logging.getLogger(__name__)
+
+# ✅ Mirrors the sidebar choices in frontend/app.py
+SUBJECTS = ["Mathematics", "Physics", "Computer Science", "History", "Biology", "Programming"]
+LEVELS = ["Beginner", "Intermediate", "Advanced"]
+
+# Question prompts only depend on their index, so warming 10 covers every quiz size
+MAX_QUESTIONS = 10
+
+_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+def build_requests(cache):
+    requests = []
+    for subject in SUBJECTS:
+        for level in LEVELS:
+            for index in range(MAX_QUESTIONS):
+                messages = _messages(QUIZ_SYSTEM_PROMPT, _create_single_question_prompt(subject, level, index))
+                key = _cache_key(messages)
+                if cache.exists(key):
+                    continue
+                requests.append({
+                    "custom_id": key,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": _completion_params(messages, json_mode=True)
+                })
+    return requests
+
+def submit_batch(client, requests):
+    payload = b"\n".join(orjson.dumps(request) for request in requests)
+    batch_file = client.files.create(file=("prewarm.jsonl", io.BytesIO(payload)), purpose="batch")
+    return client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+
+def wait_for_batch(client, batch_id, poll_interval):
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        logger.info(f"Batch {batch_id} status: {batch.status}")
+        if batch.status in _TERMINAL_STATUSES:
+            return batch
+        time.sleep(poll_interval)
+
+def store_results(client, cache, batch):
+    stored = 0
+    output = client.files.content(batch.output_file_id).text
+    for line in output.splitlines():
+        if not line:
+            continue
+        result = orjson.loads(line)
+        response = result.get("response") or {}
+        if response.get("status_code") != 200:
+            logger.warning(f"Skipping failed request {result['custom_id']}")
+            continue
+
+        content = response["body"]["choices"][0]["message"]["content"]
+        try:
+            _parse_question_response(content)
+        except (orjson.JSONDecodeError, ValidationError) as e:
+            logger.warning(f"Skipping invalid quiz response {result['custom_id']}: {str(e)}")
+            continue
+
+        cache.setex(result["custom_id"], QUIZ_CACHE_TTL, content)
+        stored += 1
+    return stored
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the quiz cache via the OpenAI Batch API")
+    parser.add_argument("--poll-interval", type=int, default=60, help="Seconds between batch status checks")
+    args = parser.parse_args()
+
+    if not REDIS_URL:
+        logger.error("REDIS_URL is not set; there is no cache to warm")
+        return 1
+
+    client = OpenAI(api_key=OPENAI_API_KEY)
+    cache = redis.from_url(REDIS_URL)
+
+    requests = build_requests(cache)
+    if not requests:
+        logger.info("Cache is already warm")
+        return 0
+
+    batch = submit_batch(client, requests)
+    logger.info(f"Submitted batch {batch.id} with {len(requests)} requests")
+
+    batch = wait_for_batch(client, batch.id, args.poll_interval)
+    if batch.status != "completed" or not batch.output_file_id:
+        logger.error(f"Batch {batch.id} finished with status {batch.status}")
+        return 1
+
+    stored = store_results(client, cache, batch)
+    logger.info(f"Stored {stored} of {len(requests)} quiz questions in the cache")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())